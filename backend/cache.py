@@ -0,0 +1,178 @@
+"""
+Recommendation caches for GlamAI
+Short-circuits repeat Claude calls for near-identical facial analyses
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+import orjson
+
+from models import FACE_SHAPE_CODES, EYE_TYPE_CODES, SKIN_TONE_CODES, UNDERTONE_CODES
+
+
+# Categorical analysis fields and their value -> integer code lookups
+CATEGORICAL_FIELDS = [
+    ("face_shape", FACE_SHAPE_CODES),
+    ("eye_type", EYE_TYPE_CODES),
+    ("skin_tone", SKIN_TONE_CODES),
+    ("undertone", UNDERTONE_CODES),
+]
+
+# Numeric analysis fields, the defaults used by the prompt builder, and how far
+# two analyses may differ on each field and still share recommendations
+NUMERIC_FIELDS = [
+    ("eye_distance_ratio", 0.35, 0.02),
+    ("lip_thickness_ratio", 0.03, 0.005),
+    ("nose_width_ratio", 0.25, 0.02),
+    ("face_symmetry", 0.8, 0.05),
+    ("eyebrow_arch_height", 0.6, 0.05),
+    ("has_prominent_cheekbones", 0.0, 0.0),
+]
+
+NUMERIC_TOLERANCES = np.array([tolerance for _, _, tolerance in NUMERIC_FIELDS], dtype=np.float32)
+
+
+def _enum_value(value) -> str:
+    """Normalize enum members and raw strings to their string value"""
+    return getattr(value, "value", value)
+
+
+def analysis_categories(analysis_data: Dict) -> np.ndarray:
+    """Integer codes of the categorical fields, -1 for unknown values"""
+    return np.array([
+        codes.get(_enum_value(analysis_data.get(field)), -1) for field, codes in CATEGORICAL_FIELDS
+    ], dtype=np.int16)
+
+
+def analysis_numbers(analysis_data: Dict) -> np.ndarray:
+    """Numeric fields as a float32 vector, in NUMERIC_FIELDS order"""
+    return np.array([
+        float(analysis_data.get(field, default)) for field, default, _ in NUMERIC_FIELDS
+    ], dtype=np.float32)
+
+
+def quantize_analysis(analysis_data: Dict, digits: int = 2) -> Dict:
+    """Round numeric fields so near-identical analyses share a cache key"""
+    quantized = {}
+    for field, value in analysis_data.items():
+        if isinstance(value, float):
+            quantized[field] = round(value, digits)
+        else:
+            quantized[field] = _enum_value(value)
+    return quantized
+
+
+def analysis_cache_key(analysis_data: Dict, digits: int = 2) -> str:
+    """SHA-256 of the quantized analysis, stable across key order"""
+    quantized = quantize_analysis(analysis_data, digits)
+    return hashlib.sha256(orjson.dumps(quantized, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class LRUCache:
+    """
+    Bounded exact-match cache
+    Evicts the least recently used entry once max_entries is exceeded,
+    and entries older than ttl_seconds on lookup
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (value, inserted_at), ordered oldest to newest use
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, inserted_at = entry
+        if self.ttl_seconds is not None and time.monotonic() - inserted_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value under key"""
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SemanticCache:
+    """
+    In-memory near-duplicate cache of recommendation dicts
+    An entry matches when every categorical field is equal and every numeric
+    field is within its NUMERIC_FIELDS tolerance, scaled by tolerance_scale
+    """
+
+    def __init__(self, tolerance_scale: float = 1.0, max_entries: int = 256, ttl_seconds: float = 3600.0):
+        self.tolerances = NUMERIC_TOLERANCES * tolerance_scale
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (categories, numbers, response, inserted_at), ordered oldest to newest use
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_key = 0
+
+        # Stacked arrays for the vectorized lookup, rebuilt lazily on change
+        self._categories: Optional[np.ndarray] = None
+        self._numbers: Optional[np.ndarray] = None
+        self._matrix_keys: list = []
+
+    def get(self, analysis_data: Dict) -> Optional[Dict]:
+        """Return the cached response closest to analysis_data, if within tolerance"""
+        self._expire()
+        if not self._entries:
+            return None
+
+        if self._categories is None:
+            self._matrix_keys = list(self._entries.keys())
+            self._categories = np.stack([self._entries[key][0] for key in self._matrix_keys])
+            self._numbers = np.stack([self._entries[key][1] for key in self._matrix_keys])
+
+        differences = np.abs(self._numbers - analysis_numbers(analysis_data))
+        matches = (
+            np.all(self._categories == analysis_categories(analysis_data), axis=1)
+            & np.all(differences <= self.tolerances, axis=1)
+        )
+        if not matches.any():
+            return None
+
+        # Among the matches, prefer the smallest worst-field difference
+        distances = np.max(differences / np.maximum(self.tolerances, 1e-6), axis=1)
+        best = int(np.argmin(np.where(matches, distances, np.inf)))
+
+        key = self._matrix_keys[best]
+        self._entries.move_to_end(key)
+        return self._entries[key][2]
+
+    def put(self, analysis_data: Dict, response: Dict) -> None:
+        """Store a response under the analysis fields"""
+        self._entries[self._next_key] = (
+            analysis_categories(analysis_data), analysis_numbers(analysis_data), response, time.monotonic()
+        )
+        self._next_key += 1
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        self._categories = None
+
+    def _expire(self) -> None:
+        """Drop entries older than the TTL"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [key for key, (_, _, _, inserted_at) in self._entries.items() if inserted_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._categories = None
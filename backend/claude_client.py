@@ -3,93 +3,48 @@ Claude AI Client for Makeup Recommendations
 Integrates with Anthropic's Claude API to generate personalized makeup advice
 """
 
+import asyncio
+import logging
 import os
-from typing import Dict, List
+import time
+import re
+from typing import Dict, List, Optional
 import json
-from anthropic import Anthropic
+import orjson
 from dotenv import load_dotenv
 
 from models import MakeupLook
+from cache import LRUCache, SemanticCache, analysis_cache_key
 
 # Load environment variables
 load_dotenv()
 
+# Child of the app logger, so records go through main.py's queue listener
+logger = logging.getLogger("glamai.claude")
 
-class ClaudeClient:
-    """
-    Client for interacting with Claude AI
-    Generates makeup recommendations based on facial analysis
-    """
+CLAUDE_MODEL = "claude-3-haiku-20240307"  # Fast, cost-effective model
 
-    def __init__(self):
-        api_key = os.getenv("CLAUDE_API_KEY")
-        if not api_key:
-            raise ValueError("CLAUDE_API_KEY environment variable is required")
+# Maximum concurrent Claude API calls; size to the account's rate limit
+CLAUDE_CONCURRENCY = int(os.getenv("CLAUDE_CONCURRENCY", "8"))
 
-        try:
-            self.client = Anthropic(api_key=api_key)
-        except Exception as e:
-            print(f"Failed to initialize Anthropic client: {e}")
-            # Fallback initialization without extra parameters
-            self.client = Anthropic(api_key=api_key)
+# Lifetime of cached recommendations
+CACHE_TTL_SECONDS = float(os.getenv("RECOMMENDATION_CACHE_TTL", "3600"))
 
-    async def get_makeup_recommendations(self, analysis_data: Dict) -> Dict:
-        """
-        Generate makeup recommendations using Claude AI
-        Takes facial analysis data and returns structured recommendations
-        """
-        try:
-            # Construct detailed prompt for Claude
-            prompt = self._build_makeup_prompt(analysis_data)
-
-            # Call Claude API
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",  # Fast, cost-effective model
-                max_tokens=2000,
-                temperature=0.7,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
-
-            # Parse Claude's response
-            response_text = response.content[0].text
-            recommendations = self._parse_claude_response(response_text, analysis_data)
+# Seconds between status checks while a message batch is processing
+BATCH_POLL_INTERVAL = float(os.getenv("CLAUDE_BATCH_POLL_INTERVAL", "10"))
 
-            return recommendations
+# Outermost {...} span of a response, found in one pass
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+JSON_DECODER = json.JSONDecoder()
 
-        except Exception as e:
-            print(f"Claude API error: {e}")
-            # Return fallback recommendations
-            return self._get_fallback_recommendations(analysis_data)
-
-    def _build_makeup_prompt(self, analysis_data: Dict) -> str:
-        """
-        Build detailed prompt for Claude based on facial analysis
-        """
-        prompt = f"""
-You are a professional makeup artist with 15+ years of experience. Analyze this client's facial features and provide personalized makeup recommendations.
-
-CLIENT ANALYSIS:
-- Face Shape: {analysis_data.get('face_shape', 'unknown')}
-- Eye Type: {analysis_data.get('eye_type', 'unknown')}
-- Skin Tone: {analysis_data.get('skin_tone', 'unknown')}
-- Undertone: {analysis_data.get('undertone', 'unknown')}
-- Eye Distance Ratio: {analysis_data.get('eye_distance_ratio', 0.35):.2f}
-- Lip Thickness Ratio: {analysis_data.get('lip_thickness_ratio', 0.03):.2f}
-- Nose Width Ratio: {analysis_data.get('nose_width_ratio', 0.25):.2f}
-- Face Symmetry: {analysis_data.get('face_symmetry', 0.8):.2f}
-- Prominent Cheekbones: {analysis_data.get('has_prominent_cheekbones', False)}
-- Eyebrow Arch Height: {analysis_data.get('eyebrow_arch_height', 0.6):.2f}
+# Static prompt scaffold shared by every request, marked for prompt caching
+SYSTEM_PROMPT = """You are a professional makeup artist with 15+ years of experience. Analyze the client's facial features and provide personalized makeup recommendations.
 
 Please provide EXACTLY 3 makeup looks with detailed recommendations. Respond in this EXACT JSON format:
 
-{{
+{
     "recommended_looks": [
-        {{
+        {
             "look_name": "Natural Everyday",
             "description": "A fresh, natural look perfect for daily wear",
             "foundation_tips": ["Tip 1", "Tip 2"],
@@ -101,8 +56,8 @@ Please provide EXACTLY 3 makeup looks with detailed recommendations. Respond in
             "avoid": ["Thing to avoid 1", "Thing to avoid 2"],
             "difficulty_level": "Beginner",
             "occasion": "Daily wear, work, casual"
-        }},
-        {{
+        },
+        {
             "look_name": "Evening Glam",
             "description": "Sophisticated evening look",
             "foundation_tips": ["Tip 1", "Tip 2"],
@@ -114,8 +69,8 @@ Please provide EXACTLY 3 makeup looks with detailed recommendations. Respond in
             "avoid": ["Thing to avoid 1"],
             "difficulty_level": "Intermediate",
             "occasion": "Date night, dinner, events"
-        }},
-        {{
+        },
+        {
             "look_name": "Special Occasion",
             "description": "Dramatic look for special events",
             "foundation_tips": ["Tip 1", "Tip 2"],
@@ -127,20 +82,20 @@ Please provide EXACTLY 3 makeup looks with detailed recommendations. Respond in
             "avoid": ["Thing to avoid 1"],
             "difficulty_level": "Advanced",
             "occasion": "Weddings, galas, photoshoots"
-        }}
+        }
     ],
-    "face_shape_tips": ["Tip 1 for {analysis_data.get('face_shape', 'your')} face", "Tip 2"],
-    "eye_shape_tips": ["Tip 1 for {analysis_data.get('eye_type', 'your')} eyes", "Tip 2"],
-    "skin_tone_tips": ["Tip 1 for {analysis_data.get('skin_tone', 'your')} skin", "Tip 2"],
+    "face_shape_tips": ["Tip 1 for the client's face shape", "Tip 2"],
+    "eye_shape_tips": ["Tip 1 for the client's eye type", "Tip 2"],
+    "skin_tone_tips": ["Tip 1 for the client's skin tone", "Tip 2"],
     "recommended_tools": ["Tool 1", "Tool 2", "Tool 3", "Tool 4"],
-    "color_palette": {{
+    "color_palette": {
         "neutrals": ["Color 1", "Color 2", "Color 3"],
         "accents": ["Color 1", "Color 2"],
         "lips": ["Color 1", "Color 2", "Color 3"],
         "blush": ["Color 1", "Color 2"]
-    }},
+    },
     "top_priority_tip": "The single most important makeup tip for this face"
-}}
+}
 
 Focus on:
 1. Colors that complement the skin tone and undertone
@@ -151,30 +106,258 @@ Focus on:
 
 Be specific with color names (e.g., "warm peachy coral", "matte taupe brown") and detailed with techniques.
 """
-        return prompt
 
-    def _parse_claude_response(self, response_text: str, analysis_data: Dict) -> Dict:
+# Per-client prompt, precompiled once and filled with str.format_map
+CLIENT_PROMPT_TEMPLATE = """
+CLIENT ANALYSIS:
+- Face Shape: {face_shape}
+- Eye Type: {eye_type}
+- Skin Tone: {skin_tone}
+- Undertone: {undertone}
+- Eye Distance Ratio: {eye_distance_ratio:.2f}
+- Lip Thickness Ratio: {lip_thickness_ratio:.2f}
+- Nose Width Ratio: {nose_width_ratio:.2f}
+- Face Symmetry: {face_symmetry:.2f}
+- Prominent Cheekbones: {has_prominent_cheekbones}
+- Eyebrow Arch Height: {eyebrow_arch_height:.2f}
+
+Provide the 3 makeup looks for this client in the required JSON format.
+"""
+
+# Values used for any field missing from the analysis
+CLIENT_PROMPT_DEFAULTS = {
+    "face_shape": "unknown",
+    "eye_type": "unknown",
+    "skin_tone": "unknown",
+    "undertone": "unknown",
+    "eye_distance_ratio": 0.35,
+    "lip_thickness_ratio": 0.03,
+    "nose_width_ratio": 0.25,
+    "face_symmetry": 0.8,
+    "has_prominent_cheekbones": False,
+    "eyebrow_arch_height": 0.6,
+}
+
+
+class ClaudeClient:
+    """
+    Client for interacting with Claude AI
+    Generates makeup recommendations based on facial analysis
+    """
+
+    def __init__(self):
+        api_key = os.getenv("CLAUDE_API_KEY")
+        if not api_key:
+            raise ValueError("CLAUDE_API_KEY environment variable is required")
+
+        # The Anthropic SDK is heavy to import, so the client is built on first use
+        self._api_key = api_key
+        self._client = None
+        self._api_semaphore = asyncio.Semaphore(CLAUDE_CONCURRENCY)
+
+        # Identical analyses hit the exact cache, near-duplicates the semantic one
+        # Both expire after CACHE_TTL_SECONDS so prompt changes eventually take effect
+        self._exact_cache = LRUCache(max_entries=1024, ttl_seconds=CACHE_TTL_SECONDS)
+        self._semantic_cache = SemanticCache(
+            tolerance_scale=float(os.getenv("SEMANTIC_CACHE_TOLERANCE", "1.0")),
+            ttl_seconds=CACHE_TTL_SECONDS
+        )
+
+    def _get_client(self):
+        """Return the Anthropic client, importing the SDK on first use"""
+        if self._client is None:
+            import httpx
+            from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+
+            try:
+                # One long-lived pooled HTTP/2 connection set, reused across requests
+                self._client = AsyncAnthropic(
+                    api_key=self._api_key,
+                    http_client=DefaultAsyncHttpxClient(
+                        http2=True,
+                        limits=httpx.Limits(
+                            max_connections=CLAUDE_CONCURRENCY,
+                            max_keepalive_connections=CLAUDE_CONCURRENCY
+                        )
+                    )
+                )
+            except Exception as e:
+                logger.warning("Failed to initialize Anthropic client: %s", e)
+                # Fallback initialization without extra parameters
+                self._client = AsyncAnthropic(api_key=self._api_key)
+
+        return self._client
+
+    async def get_makeup_recommendations(self, analysis_data: Dict) -> Dict:
+        """
+        Generate makeup recommendations using Claude AI
+        Takes facial analysis data and returns structured recommendations
+        """
+        # Skip the API call entirely for repeat or near-identical faces
+        cache_key = analysis_cache_key(analysis_data)
+        cached = self._get_cached(cache_key, analysis_data)
+        if cached is not None:
+            return cached
+
+        try:
+            # Bound in-flight API calls; cache hits above never wait here
+            async with self._api_semaphore:
+                # Stream the response so time-to-first-token is observable
+                started = time.perf_counter()
+                first_token_at = None
+                chunks = []
+
+                async with self._get_client().messages.stream(**self._message_params(analysis_data)) as stream:
+                    async for text in stream.text_stream:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        chunks.append(text)
+
+                    # Usage shows whether the cached system prompt was read or written
+                    usage = (await stream.get_final_message()).usage
+
+            if first_token_at is not None:
+                logger.info(
+                    "Claude TTFT %.3fs, total %.3fs, cache read %d / written %d tokens",
+                    first_token_at - started,
+                    time.perf_counter() - started,
+                    usage.cache_read_input_tokens or 0,
+                    usage.cache_creation_input_tokens or 0
+                )
+
+            # Parse Claude's response
+            recommendations = self._parse_claude_response("".join(chunks))
+
+            if recommendations is None:
+                return self._get_fallback_recommendations(analysis_data)
+
+            self._store_cached(cache_key, analysis_data, recommendations)
+            return recommendations
+
+        except Exception as e:
+            logger.error("Claude API error: %s", e)
+            # Return fallback recommendations
+            return self._get_fallback_recommendations(analysis_data)
+
+    async def get_makeup_recommendations_batch(self, analyses: List[Dict]) -> List[Dict]:
+        """
+        Generate recommendations for many analyses via the Message Batches API
+        Intended for non-interactive bulk jobs; results keep the input order
+        """
+        results: List[Optional[Dict]] = [None] * len(analyses)
+        cache_keys = [analysis_cache_key(analysis_data) for analysis_data in analyses]
+
+        # Only analyses missing from the caches are sent to Claude
+        pending = {}
+        for i, analysis_data in enumerate(analyses):
+            results[i] = self._get_cached(cache_keys[i], analysis_data)
+            if results[i] is None:
+                pending[f"face-{i}"] = i
+
+        if pending:
+            try:
+                batch = await self._get_client().messages.batches.create(
+                    requests=[
+                        {"custom_id": custom_id, "params": self._message_params(analyses[i])}
+                        for custom_id, i in pending.items()
+                    ]
+                )
+
+                while batch.processing_status != "ended":
+                    await asyncio.sleep(BATCH_POLL_INTERVAL)
+                    batch = await self._get_client().messages.batches.retrieve(batch.id)
+
+                async for entry in await self._get_client().messages.batches.results(batch.id):
+                    i = pending.get(entry.custom_id)
+                    if i is None or entry.result.type != "succeeded":
+                        continue
+
+                    recommendations = self._parse_claude_response(entry.result.message.content[0].text)
+                    if recommendations is not None:
+                        results[i] = recommendations
+                        self._store_cached(cache_keys[i], analyses[i], recommendations)
+
+            except Exception as e:
+                logger.error("Claude batch API error: %s", e)
+
+        # Anything that failed or errored gets the fallback recommendations
+        return [
+            result if result is not None else self._get_fallback_recommendations(analysis_data)
+            for result, analysis_data in zip(results, analyses)
+        ]
+
+    def _get_cached(self, cache_key: str, analysis_data: Dict) -> Optional[Dict]:
+        """Look up recommendations in the exact cache, then the semantic cache"""
+        cached = self._exact_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        cached = self._semantic_cache.get(analysis_data)
+        if cached is not None:
+            self._exact_cache.put(cache_key, cached)
+        return cached
+
+    def _store_cached(self, cache_key: str, analysis_data: Dict, recommendations: Dict) -> None:
+        """Remember successful recommendations in both caches"""
+        self._exact_cache.put(cache_key, recommendations)
+        self._semantic_cache.put(analysis_data, recommendations)
+
+    def _message_params(self, analysis_data: Dict) -> Dict:
+        """
+        Build the Messages API parameters for one analysis
+        Shared by the interactive and batch paths
+        """
+        return {
+            "model": CLAUDE_MODEL,
+            "max_tokens": 2000,
+            "temperature": 0.7,
+            "system": [
+                {
+                    "type": "text",
+                    "text": SYSTEM_PROMPT,
+                    "cache_control": {"type": "ephemeral"}
+                }
+            ],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": self._build_makeup_prompt(analysis_data)
+                }
+            ]
+        }
+
+    def _build_makeup_prompt(self, analysis_data: Dict) -> str:
+        """
+        Build the per-client part of the prompt from facial analysis
+        Instructions and the response format live in SYSTEM_PROMPT
+        """
+        return CLIENT_PROMPT_TEMPLATE.format_map({**CLIENT_PROMPT_DEFAULTS, **analysis_data})
+
+    def _parse_claude_response(self, response_text: str) -> Optional[Dict]:
         """
         Parse Claude's JSON response and validate structure
+        Returns None if the response could not be parsed
         """
         try:
-            # Try to extract JSON from response
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
+            # Try to extract JSON from response in a single scan
+            match = JSON_OBJECT_RE.search(response_text)
 
-            if json_start != -1 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
-                parsed_response = json.loads(json_text)
+            if match:
+                try:
+                    parsed_response = orjson.loads(match.group())
+                except orjson.JSONDecodeError:
+                    # Braces in trailing prose widen the match; decode only
+                    # the first complete object instead
+                    parsed_response, _ = JSON_DECODER.raw_decode(response_text, match.start())
 
                 # Validate required fields
-                if "recommended_looks" in parsed_response:
+                if isinstance(parsed_response, dict) and "recommended_looks" in parsed_response:
                     return parsed_response
 
         except (json.JSONDecodeError, KeyError) as e:
-            print(f"Failed to parse Claude response: {e}")
+            logger.warning("Failed to parse Claude response: %s", e)
 
-        # Fallback to structured response if parsing fails
-        return self._get_fallback_recommendations(analysis_data)
+        return None
 
     def _get_fallback_recommendations(self, analysis_data: Dict) -> Dict:
         """
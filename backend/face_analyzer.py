@@ -3,13 +3,86 @@ Face Analysis using MediaPipe
 Extracts facial features and characteristics for makeup recommendations
 """
 
-import cv2
-import mediapipe as mp
+import asyncio
+import concurrent.futures
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+from bisect import bisect_right
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 from typing import Dict, Optional, Tuple
-import math
 
-from models import FaceShape, EyeType, SkinTone, Undertone
+from models import (
+    FaceShape, EyeType, SkinTone, Undertone,
+    FaceShapeCode, EyeTypeCode, SkinToneCode, UndertoneCode,
+)
+
+# Child of the app logger, so records go through main.py's queue listener
+logger = logging.getLogger("glamai.face")
+
+# Longest image side fed to MediaPipe; larger photos are downscaled first
+MAX_IMAGE_SIDE = 640
+
+# Cores this process may run on; os.cpu_count() reports the host's cores,
+# which in a container can be far more than its CPU allowance
+AVAILABLE_CORES = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+# Number of pre-warmed FaceMesh instances; each one serves a single call at a time
+# Each mesh holds ~25 MB, so default to this worker's share of the cores, at most 2
+FACE_MESH_POOL_SIZE = int(os.getenv(
+    "FACE_MESH_POOL_SIZE",
+    max(1, min(2, AVAILABLE_CORES // int(os.getenv("WEB_CONCURRENCY", "1"))))
+))
+
+# Run a full garbage collection after every N analyses to release MediaPipe
+# result buffers promptly under sustained load; 0 leaves it to the interpreter
+GC_EVERY_N_ANALYSES = int(os.getenv("GC_EVERY_N_ANALYSES", "0"))
+
+# Key landmark indices for facial features, as int32 arrays for fancy indexing
+FACE_OVAL = np.array([10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288,
+                      397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136,
+                      172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109], dtype=np.int32)
+
+# Eye landmarks
+LEFT_EYE = np.array([362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398], dtype=np.int32)
+RIGHT_EYE = np.array([33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246], dtype=np.int32)
+
+# Lip landmarks
+LIPS = np.array([61, 146, 91, 181, 84, 17, 314, 405, 320, 307, 375, 321, 308, 324, 318], dtype=np.int32)
+
+# Nose landmarks
+NOSE = np.array([19, 20, 237, 44, 1, 2, 5, 4, 6, 168, 8, 9, 10, 151], dtype=np.int32)
+
+# Landmark pairs behind every geometric feature, measured together in one pass
+DISTANCE_PAIRS = {
+    "face_width": (454, 234),       # Cheekbone to cheekbone
+    "face_height": (10, 152),       # Forehead to chin
+    "jaw_width": (172, 397),
+    "forehead_width": (103, 332),
+    "eye_distance": (133, 362),     # Inner eye corners
+    "lip_height": (13, 14),         # Upper to lower lip
+    "nose_width": (131, 358),
+    "left_eye_width": (LEFT_EYE[0], LEFT_EYE[3]),
+    "left_eye_height": (LEFT_EYE[1], LEFT_EYE[5]),
+    "right_eye_width": (RIGHT_EYE[0], RIGHT_EYE[3]),
+    "right_eye_height": (RIGHT_EYE[1], RIGHT_EYE[5]),
+}
+DISTANCE_NAMES = list(DISTANCE_PAIRS)
+DISTANCE_FIRST = np.array([first for first, _ in DISTANCE_PAIRS.values()], dtype=np.int32)
+DISTANCE_SECOND = np.array([second for _, second in DISTANCE_PAIRS.values()], dtype=np.int32)
+
+# Brightness cut-offs and the skin tone each band maps to, darkest first
+SKIN_TONE_THRESHOLDS = (60, 100, 140, 180)
+SKIN_TONE_BANDS = (SkinToneCode.DEEP, SkinToneCode.TAN, SkinToneCode.MEDIUM, SkinToneCode.LIGHT, SkinToneCode.FAIR)
+
+# API strings indexed by classifier code, for the one conversion at the boundary
+FACE_SHAPE_VALUES = tuple(member.value for member in FaceShape)
+EYE_TYPE_VALUES = tuple(member.value for member in EyeType)
+SKIN_TONE_VALUES = tuple(member.value for member in SkinTone)
+UNDERTONE_VALUES = tuple(member.value for member in Undertone)
 
 
 class FaceAnalyzer:
@@ -18,274 +91,349 @@ class FaceAnalyzer:
     Extracts geometry, proportions, and characteristics
     """
 
-    def __init__(self):
-        # Initialize MediaPipe Face Mesh
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=True,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5
-        )
-
-        # Define key landmark indices for facial features
-        self.FACE_OVAL = [10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288,
-                         397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136,
-                         172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109]
+    def __init__(self, pool_size: int = FACE_MESH_POOL_SIZE):
+        self._process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._process_workers = 0
 
-        # Eye landmarks
-        self.LEFT_EYE = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
-        self.RIGHT_EYE = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
+        # OpenCV and MediaPipe are heavy to import, so load them on construction
+        import cv2
+        import mediapipe as mp
+        self._cv2 = cv2
 
-        # Lip landmarks
-        self.LIPS = [61, 146, 91, 181, 84, 17, 314, 405, 320, 307, 375, 321, 308, 324, 318]
+        # Initialize a pool of MediaPipe Face Mesh instances
+        # FaceMesh is not thread-safe, so concurrent analyses each borrow their own
+        self.mp_face_mesh = mp.solutions.face_mesh
+        self._mesh_pool: asyncio.Queue = asyncio.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            face_mesh = self.mp_face_mesh.FaceMesh(
+                static_image_mode=True,
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5
+            )
+            # Run one blank frame so the graph and TFLite delegate are
+            # initialized here rather than on the first request
+            face_mesh.process(np.zeros((64, 64, 3), dtype=np.uint8))
+            self._mesh_pool.put_nowait(face_mesh)
+
+        self._analysis_count = itertools.count(1)
+
+    def start_process_pool(self, max_workers: int):
+        """
+        Run analyses in max_workers subprocesses, each with its own FaceMesh
+        Spawned rather than forked, since the parent already runs native threads;
+        construct this analyzer with pool_size=0 so the parent builds no meshes
+        """
+        self._process_workers = max_workers
+        self._process_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
 
-        # Nose landmarks
-        self.NOSE = [19, 20, 237, 44, 1, 2, 5, 4, 6, 168, 8, 9, 10, 151]
+    def shutdown_process_pool(self):
+        """Stop the analysis subprocesses, if any"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
 
     async def analyze_face(self, image_path: str) -> Optional[Dict]:
         """
         Main analysis function
         Returns facial analysis data or None if no face detected
         """
-        try:
-            # Load and process image
-            image = cv2.imread(image_path)
-            if image is None:
-                return None
+        if self._process_pool is not None:
+            # Only the path crosses the process boundary; the worker reads the file
+            return await self._run_in_process(_analyze_worker, image_path)
+        return await self._run_pooled(self._sync_analyze, image_path)
 
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            results = self.face_mesh.process(image_rgb)
+    async def analyze_bytes(self, data: bytes) -> Optional[Dict]:
+        """
+        Analyze an encoded image held in memory, without touching disk
+        Returns facial analysis data or None if no face detected
+        """
+        if self._process_pool is not None:
+            return await self._run_in_process(_analyze_bytes_worker, data)
+        return await self._run_pooled(self._sync_analyze_bytes, data)
 
-            if not results.multi_face_landmarks:
+    async def _run_in_process(self, worker, source) -> Optional[Dict]:
+        """
+        Run a module-level analysis function in the process pool
+        A pool broken by a crashed subprocess is rebuilt and the call retried once
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._process_pool
+            try:
+                return await loop.run_in_executor(pool, worker, source)
+
+            except BrokenProcessPool:
+                # Not a "no face" result: let the caller turn a second failure into a 5xx
+                if attempt:
+                    raise
+                logger.error("Analysis subprocess died; restarting the process pool")
+                self._restart_process_pool(pool)
+
+            except Exception as e:
+                logger.error("Analysis error: %s", e)
                 return None
 
-            # Get landmarks for the first (and only) face
-            landmarks = results.multi_face_landmarks[0]
-            h, w, _ = image.shape
-
-            # Convert normalized landmarks to pixel coordinates
-            face_landmarks = []
-            for landmark in landmarks.landmark:
-                x = int(landmark.x * w)
-                y = int(landmark.y * h)
-                face_landmarks.append((x, y))
-
-            # Perform detailed analysis
-            analysis = {
-                "face_shape": self._determine_face_shape(face_landmarks),
-                "eye_type": self._determine_eye_type(face_landmarks),
-                "skin_tone": self._analyze_skin_tone(image_rgb, face_landmarks),
-                "undertone": self._analyze_undertone(image_rgb, face_landmarks),
-                "eye_distance_ratio": self._calculate_eye_distance_ratio(face_landmarks),
-                "lip_thickness_ratio": self._calculate_lip_thickness_ratio(face_landmarks),
-                "nose_width_ratio": self._calculate_nose_width_ratio(face_landmarks),
-                "face_symmetry": self._calculate_face_symmetry(face_landmarks),
-                "has_prominent_cheekbones": self._detect_prominent_cheekbones(face_landmarks),
-                "eyebrow_arch_height": self._calculate_eyebrow_arch(face_landmarks),
-                "analysis_confidence": 0.85  # Default confidence score
-            }
-
-            return analysis
+    def _restart_process_pool(self, broken: concurrent.futures.ProcessPoolExecutor):
+        """Replace a broken process pool, unless a concurrent caller already did"""
+        if self._process_pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.start_process_pool(self._process_workers)
+
+    async def _run_pooled(self, analyze, source) -> Optional[Dict]:
+        """Run a blocking analysis function with a FaceMesh borrowed from the pool"""
+        try:
+            # Borrow a FaceMesh and run the CPU-bound pipeline off the event loop;
+            # OpenCV and MediaPipe release the GIL inside their native calls
+            face_mesh = await self._mesh_pool.get()
+            future = asyncio.get_running_loop().run_in_executor(None, analyze, source, face_mesh)
+
+            # Hand the mesh back only once the thread is done with it; the shield
+            # keeps a cancelled request from releasing a mesh that is still in use
+            future.add_done_callback(lambda _: self._mesh_pool.put_nowait(face_mesh))
+            result = await asyncio.shield(future)
 
         except Exception as e:
-            print(f"Analysis error: {e}")
+            logger.error("Analysis error: %s", e)
+            result = None
+
+        if GC_EVERY_N_ANALYSES and next(self._analysis_count) % GC_EVERY_N_ANALYSES == 0:
+            await asyncio.to_thread(gc.collect)
+        return result
+
+    def _sync_analyze(self, image_path: str, face_mesh) -> Optional[Dict]:
+        """Blocking analysis of an image file"""
+        image = self._cv2.imread(image_path)
+        if image is None:
+            return None
+        return self._sync_analyze_image(image, face_mesh)
+
+    def _sync_analyze_bytes(self, data: bytes, face_mesh) -> Optional[Dict]:
+        """Blocking analysis of an encoded image buffer"""
+        image = self._cv2.imdecode(np.frombuffer(data, dtype=np.uint8), self._cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        return self._sync_analyze_image(image, face_mesh)
+
+    def _sync_analyze_image(self, image: np.ndarray, face_mesh) -> Optional[Dict]:
+        """
+        Blocking analysis pipeline on a decoded BGR image: landmarks and measurements
+        Must only be called with a FaceMesh borrowed from the pool
+        """
+        cv2 = self._cv2
+
+        # Downscale large uploads; landmark ratios are scale-invariant
+        scale = MAX_IMAGE_SIDE / max(image.shape[:2])
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        results = face_mesh.process(image_rgb)
+
+        if not results.multi_face_landmarks:
             return None
 
-    def _determine_face_shape(self, landmarks: list) -> FaceShape:
+        # Get landmarks for the first (and only) face
+        landmarks = results.multi_face_landmarks[0]
+        h, w, _ = image.shape
+
+        # Convert normalized landmarks to an (N, 2) array of pixel coordinates,
+        # filled in a single pass without intermediate tuples
+        points = landmarks.landmark
+        pts = np.fromiter(
+            (coord for landmark in points for coord in (landmark.x, landmark.y)),
+            dtype=np.float32,
+            count=2 * len(points)
+        ).reshape(-1, 2)
+        pts *= np.array([w, h], dtype=np.float32)
+
+        # Landmarks are copied out; drop the protobuf results before the measurements
+        del results, landmarks, points
+
+        # Skin tone and undertone share one pass over the face region
+        skin_tone, undertone = self._analyze_color(image_rgb, pts)
+
+        # Every landmark distance the classifiers need, in one vectorized pass
+        distances = self._measure_distances(pts)
+
+        # Perform detailed analysis; classifier codes become API strings here
+        analysis = {
+            "face_shape": FACE_SHAPE_VALUES[self._determine_face_shape(distances)],
+            "eye_type": EYE_TYPE_VALUES[self._determine_eye_type(distances)],
+            "skin_tone": SKIN_TONE_VALUES[skin_tone],
+            "undertone": UNDERTONE_VALUES[undertone],
+            "eye_distance_ratio": self._calculate_eye_distance_ratio(distances),
+            "lip_thickness_ratio": self._calculate_lip_thickness_ratio(distances),
+            "nose_width_ratio": self._calculate_nose_width_ratio(distances),
+            "face_symmetry": self._calculate_face_symmetry(pts),
+            "has_prominent_cheekbones": self._detect_prominent_cheekbones(distances),
+            "eyebrow_arch_height": self._calculate_eyebrow_arch(pts),
+            "analysis_confidence": 0.85  # Default confidence score
+        }
+
+        return analysis
+
+    def _measure_distances(self, pts: np.ndarray) -> Dict[str, float]:
+        """Measure all DISTANCE_PAIRS at once, keyed by feature name"""
+        distances = np.linalg.norm(pts[DISTANCE_FIRST] - pts[DISTANCE_SECOND], axis=1)
+        return dict(zip(DISTANCE_NAMES, distances.tolist()))
+
+    def _determine_face_shape(self, distances: Dict[str, float]) -> FaceShapeCode:
         """Determine face shape based on facial proportions"""
         try:
-            # Get key points for face outline
-            face_width = self._distance(landmarks[454], landmarks[234])  # Horizontal
-            face_height = self._distance(landmarks[10], landmarks[152])  # Vertical
-            jaw_width = self._distance(landmarks[172], landmarks[397])   # Jaw line
-            forehead_width = self._distance(landmarks[103], landmarks[332])  # Forehead
-
             # Calculate ratios
-            width_height_ratio = face_width / face_height
-            jaw_forehead_ratio = jaw_width / forehead_width
+            width_height_ratio = distances["face_width"] / distances["face_height"]
+            jaw_forehead_ratio = distances["jaw_width"] / distances["forehead_width"]
 
             # Classify based on ratios
             if width_height_ratio > 1.2:
-                return FaceShape.ROUND
+                return FaceShapeCode.ROUND
             elif width_height_ratio < 0.8:
-                return FaceShape.OBLONG
+                return FaceShapeCode.OBLONG
             elif jaw_forehead_ratio < 0.8:
-                return FaceShape.HEART
+                return FaceShapeCode.HEART
             elif abs(jaw_forehead_ratio - 1.0) < 0.1 and 0.9 <= width_height_ratio <= 1.1:
-                return FaceShape.SQUARE
+                return FaceShapeCode.SQUARE
             elif abs(jaw_forehead_ratio - 1.0) < 0.15:
-                return FaceShape.OVAL
+                return FaceShapeCode.OVAL
             else:
-                return FaceShape.DIAMOND
+                return FaceShapeCode.DIAMOND
 
         except:
-            return FaceShape.OVAL  # Default fallback
+            return FaceShapeCode.OVAL  # Default fallback
 
-    def _determine_eye_type(self, landmarks: list) -> EyeType:
+    def _determine_eye_type(self, distances: Dict[str, float]) -> EyeTypeCode:
         """Determine eye type based on eye shape analysis"""
         try:
-            # Analyze left eye (index 0) and right eye (index 1)
-            left_eye_points = [landmarks[i] for i in self.LEFT_EYE[:6]]
-            right_eye_points = [landmarks[i] for i in self.RIGHT_EYE[:6]]
+            # Eye width and height for both eyes
+            left_width, left_height = distances["left_eye_width"], distances["left_eye_height"]
+            right_width, right_height = distances["right_eye_width"], distances["right_eye_height"]
 
-            # Calculate eye width and height for both eyes
-            left_width = self._distance(left_eye_points[0], left_eye_points[3])
-            left_height = self._distance(left_eye_points[1], left_eye_points[5])
             left_ratio = left_height / left_width if left_width > 0 else 0
-
-            right_width = self._distance(right_eye_points[0], right_eye_points[3])
-            right_height = self._distance(right_eye_points[1], right_eye_points[5])
             right_ratio = right_height / right_width if right_width > 0 else 0
 
             avg_ratio = (left_ratio + right_ratio) / 2
 
             # Classify based on height-to-width ratio
             if avg_ratio > 0.5:
-                return EyeType.ROUND
+                return EyeTypeCode.ROUND
             elif avg_ratio < 0.3:
-                return EyeType.MONOLID
+                return EyeTypeCode.MONOLID
             else:
-                return EyeType.ALMOND  # Most common default
+                return EyeTypeCode.ALMOND  # Most common default
 
         except:
-            return EyeType.ALMOND
+            return EyeTypeCode.ALMOND
+
+    def _analyze_color(self, image: np.ndarray, pts: np.ndarray) -> Tuple[SkinToneCode, UndertoneCode]:
+        """Analyze skin tone and undertone from a single pass over the face outline"""
+        cv2 = self._cv2
 
-    def _analyze_skin_tone(self, image: np.ndarray, landmarks: list) -> SkinTone:
-        """Analyze skin tone from face region"""
         try:
-            # Extract face region for color analysis
-            face_region = self._extract_face_region(image, landmarks)
-
-            # Calculate average brightness
-            gray = cv2.cvtColor(face_region, cv2.COLOR_RGB2GRAY)
-            avg_brightness = np.mean(gray)
-
-            # Classify based on brightness (simplified)
-            if avg_brightness < 60:
-                return SkinTone.DEEP
-            elif avg_brightness < 100:
-                return SkinTone.TAN
-            elif avg_brightness < 140:
-                return SkinTone.MEDIUM
-            elif avg_brightness < 180:
-                return SkinTone.LIGHT
-            else:
-                return SkinTone.FAIR
+            # Mask the face outline so background pixels don't skew the colors
+            mask = np.zeros(image.shape[:2], dtype=np.uint8)
+            cv2.fillConvexPoly(mask, pts[FACE_OVAL].astype(np.int32), 255)
 
-        except:
-            return SkinTone.MEDIUM  # Default
+            if not cv2.countNonZero(mask):
+                # Use center region as fallback
+                h, w = image.shape[:2]
+                mask[h//4:3*h//4, w//4:3*w//4] = 255
 
-    def _analyze_undertone(self, image: np.ndarray, landmarks: list) -> Undertone:
-        """Analyze skin undertone from face region"""
-        try:
-            # Extract face region
-            face_region = self._extract_face_region(image, landmarks)
-
-            # Calculate color channel averages
-            avg_r = np.mean(face_region[:, :, 0])
-            avg_g = np.mean(face_region[:, :, 1])
-            avg_b = np.mean(face_region[:, :, 2])
-
-            # Simple undertone detection based on color balance
-            if avg_r > avg_g and avg_r > avg_b:
-                return Undertone.WARM
-            elif avg_b > avg_r and avg_b > avg_g:
-                return Undertone.COOL
-            else:
-                return Undertone.NEUTRAL
+            # Calculate all color channel averages in one masked pass
+            avg_r, avg_g, avg_b, _ = cv2.mean(image, mask=mask)
 
-        except:
-            return Undertone.NEUTRAL
+            # Brightness from the channel means, using the RGB-to-gray weights
+            avg_brightness = 0.299 * avg_r + 0.587 * avg_g + 0.114 * avg_b
 
-    def _calculate_eye_distance_ratio(self, landmarks: list) -> float:
+            return self._classify_skin_tone(avg_brightness), self._classify_undertone(avg_r, avg_g, avg_b)
+
+        except:
+            return SkinToneCode.MEDIUM, UndertoneCode.NEUTRAL  # Defaults
+
+    def _classify_skin_tone(self, avg_brightness: float) -> SkinToneCode:
+        """Classify skin tone based on brightness (simplified)"""
+        return SKIN_TONE_BANDS[bisect_right(SKIN_TONE_THRESHOLDS, avg_brightness)]
+
+    def _classify_undertone(self, avg_r: float, avg_g: float, avg_b: float) -> UndertoneCode:
+        """Simple undertone detection based on color balance"""
+        if avg_r > avg_g and avg_r > avg_b:
+            return UndertoneCode.WARM
+        elif avg_b > avg_r and avg_b > avg_g:
+            return UndertoneCode.COOL
+        else:
+            return UndertoneCode.NEUTRAL
+
+    def _calculate_eye_distance_ratio(self, distances: Dict[str, float]) -> float:
         """Calculate ratio of eye distance to face width"""
         try:
-            # Distance between inner eye corners
-            eye_distance = self._distance(landmarks[133], landmarks[362])
-            # Face width
-            face_width = self._distance(landmarks[454], landmarks[234])
+            eye_distance, face_width = distances["eye_distance"], distances["face_width"]
 
             ratio = eye_distance / face_width if face_width > 0 else 0.35
-            return min(max(ratio, 0.0), 1.0)  # Clamp to [0, 1]
+            return float(min(max(ratio, 0.0), 1.0))  # Clamp to [0, 1]
 
         except:
             return 0.35  # Average ratio
 
-    def _calculate_lip_thickness_ratio(self, landmarks: list) -> float:
+    def _calculate_lip_thickness_ratio(self, distances: Dict[str, float]) -> float:
         """Calculate lip thickness relative to face height"""
         try:
-            # Lip height (upper to lower lip)
-            lip_height = self._distance(landmarks[13], landmarks[14])
-            # Face height
-            face_height = self._distance(landmarks[10], landmarks[152])
+            lip_height, face_height = distances["lip_height"], distances["face_height"]
 
             ratio = lip_height / face_height if face_height > 0 else 0.03
-            return min(max(ratio, 0.0), 1.0)
+            return float(min(max(ratio, 0.0), 1.0))
 
         except:
             return 0.03
 
-    def _calculate_nose_width_ratio(self, landmarks: list) -> float:
+    def _calculate_nose_width_ratio(self, distances: Dict[str, float]) -> float:
         """Calculate nose width relative to face width"""
         try:
-            # Nose width
-            nose_width = self._distance(landmarks[131], landmarks[358])
-            # Face width
-            face_width = self._distance(landmarks[454], landmarks[234])
+            nose_width, face_width = distances["nose_width"], distances["face_width"]
 
             ratio = nose_width / face_width if face_width > 0 else 0.25
-            return min(max(ratio, 0.0), 1.0)
+            return float(min(max(ratio, 0.0), 1.0))
 
         except:
             return 0.25
 
-    def _calculate_face_symmetry(self, landmarks: list) -> float:
+    def _calculate_face_symmetry(self, pts: np.ndarray) -> float:
         """Calculate face symmetry score"""
         try:
             # Compare left and right sides by measuring key distances
-            center_x = landmarks[1][0]  # Nose tip x-coordinate
-
-            # Sample a few symmetric landmark pairs
-            symmetric_pairs = [
-                (landmarks[234], landmarks[454]),  # Face outline
-                (landmarks[93], landmarks[323]),   # Lower face
-                (landmarks[116], landmarks[345]),  # Mid face
-            ]
+            center_x = pts[1, 0]  # Nose tip x-coordinate
 
-            symmetry_scores = []
-            for left_point, right_point in symmetric_pairs:
-                left_dist = abs(left_point[0] - center_x)
-                right_dist = abs(right_point[0] - center_x)
+            # Sample a few symmetric landmark pairs: face outline, lower face, mid face
+            left_dist = np.abs(pts[[234, 93, 116], 0] - center_x)
+            right_dist = np.abs(pts[[454, 323, 345], 0] - center_x)
 
-                if left_dist + right_dist > 0:
-                    symmetry = 1.0 - abs(left_dist - right_dist) / (left_dist + right_dist)
-                    symmetry_scores.append(symmetry)
+            total = left_dist + right_dist
+            valid = total > 0
+            if not valid.any():
+                return 0.8
 
-            return np.mean(symmetry_scores) if symmetry_scores else 0.8
+            symmetry_scores = 1.0 - np.abs(left_dist[valid] - right_dist[valid]) / total[valid]
+            return float(np.mean(symmetry_scores))
 
         except:
             return 0.8  # Default good symmetry
 
-    def _detect_prominent_cheekbones(self, landmarks: list) -> bool:
+    def _detect_prominent_cheekbones(self, distances: Dict[str, float]) -> bool:
         """Detect if cheekbones are prominent"""
         try:
-            # Calculate cheekbone prominence based on face outline
-            cheekbone_left = landmarks[234]
-            cheekbone_right = landmarks[454]
-            jaw_left = landmarks[172]
-            jaw_right = landmarks[397]
+            # Face width is measured cheekbone to cheekbone
+            cheekbone_width, jaw_width = distances["face_width"], distances["jaw_width"]
 
             # If cheekbones are wider than jaw, they're prominent
-            cheekbone_width = self._distance(cheekbone_left, cheekbone_right)
-            jaw_width = self._distance(jaw_left, jaw_right)
-
             return cheekbone_width > jaw_width * 1.05
 
         except:
             return False
 
-    def _calculate_eyebrow_arch(self, landmarks: list) -> float:
+    def _calculate_eyebrow_arch(self, pts: np.ndarray) -> float:
         """Calculate eyebrow arch prominence"""
         try:
             # Simplified eyebrow arch calculation
@@ -296,31 +444,24 @@ class FaceAnalyzer:
         except:
             return 0.6
 
-    def _distance(self, point1: Tuple[int, int], point2: Tuple[int, int]) -> float:
-        """Calculate Euclidean distance between two points"""
-        return math.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
 
-    def _extract_face_region(self, image: np.ndarray, landmarks: list) -> np.ndarray:
-        """Extract face region from image for color analysis"""
-        try:
-            # Get bounding box of face
-            face_points = [landmarks[i] for i in self.FACE_OVAL]
-            xs = [p[0] for p in face_points]
-            ys = [p[1] for p in face_points]
+# Per-subprocess analyzer and its FaceMesh, built once by the pool initializer
+_worker_analyzer: Optional[FaceAnalyzer] = None
+_worker_mesh = None
 
-            x_min, x_max = min(xs), max(xs)
-            y_min, y_max = min(ys), max(ys)
 
-            # Add some padding
-            padding = 10
-            x_min = max(0, x_min - padding)
-            y_min = max(0, y_min - padding)
-            x_max = min(image.shape[1], x_max + padding)
-            y_max = min(image.shape[0], y_max + padding)
+def _init_worker():
+    """Process pool initializer: build this subprocess's FaceMesh"""
+    global _worker_analyzer, _worker_mesh
+    _worker_analyzer = FaceAnalyzer(pool_size=1)
+    _worker_mesh = _worker_analyzer._mesh_pool.get_nowait()
 
-            return image[y_min:y_max, x_min:x_max]
 
-        except:
-            # Return center region as fallback
-            h, w = image.shape[:2]
-            return image[h//4:3*h//4, w//4:3*w//4]
\ No newline at end of file
+def _analyze_worker(image_path: str) -> Optional[Dict]:
+    """Analyze one image file inside a process pool worker"""
+    return _worker_analyzer._sync_analyze(image_path, _worker_mesh)
+
+
+def _analyze_bytes_worker(data: bytes) -> Optional[Dict]:
+    """Analyze one encoded image buffer inside a process pool worker"""
+    return _worker_analyzer._sync_analyze_bytes(data, _worker_mesh)
@@ -0,0 +1,84 @@
+"""
+Batched file I/O for GlamAI uploads
+Writes streamed chunks with vectored syscalls off the event loop
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, List, Union
+
+import aiofiles
+
+# Bytes buffered before each vectored write is submitted
+WRITE_BATCH_SIZE = 1024 * 1024
+
+
+async def read_chunks(file, chunk_size: int) -> AsyncIterator[bytes]:
+    """Yield successive chunks from an async file-like object such as UploadFile"""
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+async def hash_chunks(chunks: AsyncIterable[bytes], digest) -> AsyncIterator[bytes]:
+    """Pass chunks through unchanged while feeding them to a hashlib digest"""
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+def _writev_all(fd: int, chunks: List[bytes]) -> int:
+    """Write every chunk to fd, resubmitting after partial writes"""
+    buffers = [memoryview(chunk) for chunk in chunks]
+    total = 0
+    while buffers:
+        written = os.writev(fd, buffers)
+        total += written
+
+        # Drop fully written buffers and trim a partially written one
+        while buffers and written >= len(buffers[0]):
+            written -= len(buffers[0])
+            buffers.pop(0)
+        if buffers and written:
+            buffers[0] = buffers[0][written:]
+    return total
+
+
+async def write_all(path: Union[str, Path], chunks: AsyncIterable[bytes]) -> int:
+    """
+    Write an async stream of chunks to path and return the byte count
+    Chunks are grouped into WRITE_BATCH_SIZE batches so each thread hop
+    issues one writev syscall instead of one write per chunk
+    """
+    if not hasattr(os, "writev"):
+        return await _write_all_fallback(path, chunks)
+
+    fd = await asyncio.to_thread(os.open, path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        total = 0
+        pending: List[bytes] = []
+        pending_size = 0
+
+        async for chunk in chunks:
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= WRITE_BATCH_SIZE:
+                total += await asyncio.to_thread(_writev_all, fd, pending)
+                pending, pending_size = [], 0
+
+        if pending:
+            total += await asyncio.to_thread(_writev_all, fd, pending)
+        return total
+
+    finally:
+        await asyncio.to_thread(os.close, fd)
+
+
+async def _write_all_fallback(path: Union[str, Path], chunks: AsyncIterable[bytes]) -> int:
+    """Chunk-by-chunk aiofiles writes for platforms without os.writev"""
+    total = 0
+    async with aiofiles.open(path, "wb") as buffer:
+        async for chunk in chunks:
+            await buffer.write(chunk)
+            total += len(chunk)
+    return total
@@ -5,14 +5,22 @@ FastAPI backend with MediaPipe face analysis and Claude AI integration
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import tempfile
 import os
-import shutil
 from pathlib import Path
+from collections import OrderedDict
 import json
 import asyncio
+import concurrent.futures
 import time
+import uuid
+import random
+import hashlib
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,11 +29,19 @@ load_dotenv()
 from face_analyzer import FaceAnalyzer
 from claude_client import ClaudeClient
 from models import AnalysisResponse, RecommendationResponse
+from io_backend import hash_chunks, read_chunks, write_all
+from cache import LRUCache
+
+logger = logging.getLogger("glamai")
+
+# Background thread that writes queued log records to stderr
+LOG_LISTENER: Optional[QueueListener] = None
 
 app = FastAPI(
     title="GlamAI API",
     description="AI-powered makeup recommendations based on facial analysis",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse  # Rust-backed JSON encoding
 )
 
 # Production CORS settings - supports both development and production
@@ -51,13 +67,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-face_analyzer = FaceAnalyzer()
-claude_client = ClaudeClient()
+# Services are built in the startup hook rather than at import: spawned
+# uvicorn workers import this file twice (as __mp_main__ and as main)
+face_analyzer: Optional[FaceAnalyzer] = None
+claude_client: Optional[ClaudeClient] = None
+
+# Create uploads directory. Selfies live for seconds, so a RAM-backed tmpfs
+# (e.g. UPLOADS_DIR=/dev/shm/glamai_uploads) skips the overlay filesystem; it is
+# opt-in because Docker's default /dev/shm is only 64 MiB
+UPLOADS_DIR = Path(os.getenv("UPLOADS_DIR", "uploads"))
+UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Read/write size for streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Worker threads for blocking work offloaded from the event loop
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "32"))
+
+# Subprocesses for face analysis; 0 keeps analysis on the thread pool. Useful when
+# running a single uvicorn worker, otherwise workers already cover the cores
+ANALYSIS_PROCESSES = int(os.getenv("ANALYSIS_PROCESSES", "0"))
+
+# Face analyses keyed by upload content hash
+ANALYSIS_CACHE = LRUCache(max_entries=256)
+
+# Backstop on stored uploads between sweeps; oldest files are evicted beyond this
+MAX_UPLOADS = int(os.getenv("MAX_UPLOADS", "10000"))
+
+# Upload path -> content hash, oldest first, so eviction needs no directory
+# scan and analyses can be shared between uploads of identical bytes
+RECENT_UPLOADS: "OrderedDict[Path, str]" = OrderedDict()
 
-# Create uploads directory
-UPLOADS_DIR = Path("uploads")
-UPLOADS_DIR.mkdir(exist_ok=True)
+# Seconds between cleanup sweeps; each wait is jittered by +/-20%
+CLEANUP_INTERVAL = 300
 
 
 @app.get("/")
@@ -77,25 +119,74 @@ async def upload_selfie(file: UploadFile = File(...)):
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
 
-        # Generate unique filename
-        file_id = f"{len(list(UPLOADS_DIR.glob('*')))}_{file.filename}"
-        file_path = UPLOADS_DIR / file_id
-
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream uploaded file to disk without blocking the event loop,
+        # hashing the content on the way through
+        digest = hashlib.blake2b(digest_size=16)
+        upload_id = uuid.uuid4().hex
+        temp_path = UPLOADS_DIR / f".{upload_id}.part"
+        try:
+            size_bytes = await write_all(temp_path, hash_chunks(read_chunks(file, UPLOAD_CHUNK_SIZE), digest))
+
+            # Unique file_id per upload so one user's cleanup never deletes another's;
+            # keep only the base name to block path traversal
+            file_id = f"{upload_id}_{Path(file.filename).name}"
+            os.replace(temp_path, UPLOADS_DIR / file_id)
+        except BaseException:
+            # Don't leave a partial selfie behind if the write or rename fails
+            unlink_all([temp_path])
+            raise
+        await track_upload(UPLOADS_DIR / file_id, digest.hexdigest())
 
         return {
             "message": "File uploaded successfully",
             "file_id": file_id,
             "original_filename": file.filename,
-            "size_bytes": file_path.stat().st_size
+            "size_bytes": size_bytes
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+async def _analyze_cached(content_hash: Optional[str], analyze, source) -> dict:
+    """
+    Run a FaceAnalyzer method on source, sharing results between identical images
+    content_hash must come from the image bytes; None skips the cache
+    """
+    # Identical image bytes were already analyzed; skip MediaPipe entirely
+    if content_hash is not None:
+        cached = ANALYSIS_CACHE.get(content_hash)
+        if cached is not None:
+            return cached
+
+    # Perform face analysis
+    analysis = await analyze(source)
+
+    if not analysis:
+        raise HTTPException(status_code=400, detail="No face detected in image")
+
+    if content_hash is not None:
+        ANALYSIS_CACHE.put(content_hash, analysis)
+    return analysis
+
+
+async def _do_analyze(file_path: Path) -> dict:
+    """
+    Run face analysis on an uploaded file
+    Returns the raw analysis dict
+    """
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # The hash was computed from the content at upload time, never from the id
+    return await _analyze_cached(RECENT_UPLOADS.get(file_path), face_analyzer.analyze_face, str(file_path))
+
+
+async def _do_recommend(analysis: dict) -> dict:
+    """Generate raw recommendations for an analysis dict using Claude"""
+    return await claude_client.get_makeup_recommendations(analysis)
+
+
 @app.post("/analyze", response_model=AnalysisResponse)
 async def analyze_face(file_id: str):
     """
@@ -103,18 +194,29 @@ async def analyze_face(file_id: str):
     Extracts facial features and characteristics
     """
     try:
-        file_path = UPLOADS_DIR / file_id
+        return AnalysisResponse(**await _do_analyze(UPLOADS_DIR / file_id))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="File not found")
 
-        # Perform face analysis
-        analysis_result = await face_analyzer.analyze_face(str(file_path))
+@app.post("/analyze-direct", response_model=AnalysisResponse)
+async def analyze_face_direct(file: UploadFile = File(...)):
+    """
+    Analyze a selfie straight from the upload, decoding it in memory
+    Nothing is written to disk, so no cleanup is needed afterwards
+    """
+    try:
+        # Validate file type
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail="File must be an image")
 
-        if not analysis_result:
-            raise HTTPException(status_code=400, detail="No face detected in image")
+        data = await file.read()
+        content_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
 
-        return AnalysisResponse(**analysis_result)
+        return AnalysisResponse(**await _analyze_cached(content_hash, face_analyzer.analyze_bytes, data))
 
     except HTTPException:
         raise
@@ -130,9 +232,7 @@ async def get_makeup_recommendations(analysis_data: AnalysisResponse):
     """
     try:
         # Generate recommendations using Claude
-        recommendations = await claude_client.get_makeup_recommendations(analysis_data.dict())
-
-        return RecommendationResponse(**recommendations)
+        return RecommendationResponse(**await _do_recommend(analysis_data.model_dump(mode="json")))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recommendation generation failed: {str(e)}")
@@ -148,18 +248,16 @@ async def analyze_and_recommend(file_id: str):
     try:
         temp_path = UPLOADS_DIR / file_id
 
-        if not temp_path.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-
-        # Step 1: Analyze face
-        analysis_result = await analyze_face(file_id)
+        # Step 1: Analyze face (404s if the upload is missing)
+        analysis_result = await _do_analyze(temp_path)
 
         # Step 2: Get recommendations
-        recommendations = await get_makeup_recommendations(analysis_result)
+        recommendations = await _do_recommend(analysis_result)
 
+        # Validate each payload once, on the way out
         return {
-            "analysis": analysis_result.dict(),
-            "recommendations": recommendations.dict(),
+            "analysis": AnalysisResponse(**analysis_result).model_dump(),
+            "recommendations": RecommendationResponse(**recommendations).model_dump(),
             "status": "success",
             "privacy_note": "Image deleted immediately after processing"
         }
@@ -171,12 +269,15 @@ async def analyze_and_recommend(file_id: str):
 
     finally:
         # CRITICAL: Immediate file cleanup for privacy
-        if temp_path and temp_path.exists():
+        if temp_path:
+            RECENT_UPLOADS.pop(temp_path, None)
             try:
                 temp_path.unlink()
-                print(f"🗑️ Privacy cleanup: {temp_path}")
+                logger.info("Privacy cleanup: %s", temp_path)
+            except FileNotFoundError:
+                pass
             except Exception as cleanup_error:
-                print(f"⚠️ Cleanup failed: {cleanup_error}")
+                logger.warning("Cleanup failed: %s", cleanup_error)
 
 
 @app.delete("/cleanup/{file_id}")
@@ -189,6 +290,7 @@ async def cleanup_file(file_id: str):
 
         if file_path.exists():
             file_path.unlink()
+            RECENT_UPLOADS.pop(file_path, None)
             return {"message": "File deleted successfully"}
         else:
             raise HTTPException(status_code=404, detail="File not found")
@@ -199,37 +301,141 @@ async def cleanup_file(file_id: str):
         raise HTTPException(status_code=500, detail=f"Cleanup failed: {str(e)}")
 
 
+def unlink_all(paths):
+    """Delete each path, ignoring files that are already gone"""
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+async def track_upload(path: Path, content_hash: str):
+    """
+    Record a new upload and its content hash, evicting the oldest beyond MAX_UPLOADS
+    Bounds the uploads directory even when bursts outpace the periodic sweep
+    """
+    RECENT_UPLOADS[path] = content_hash
+
+    evicted = []
+    while len(RECENT_UPLOADS) > MAX_UPLOADS:
+        evicted.append(RECENT_UPLOADS.popitem(last=False)[0])
+
+    if evicted:
+        await asyncio.to_thread(unlink_all, evicted)
+        logger.info("Evicted %d oldest uploads", len(evicted))
+
+
+def sweep_uploads(max_age_seconds: float = 300) -> list:
+    """
+    Delete uploads older than max_age_seconds and return their paths
+    Blocking, so it runs in a worker thread; files removed concurrently are skipped
+    """
+    cutoff = time.time() - max_age_seconds
+    deleted = []
+    with os.scandir(UPLOADS_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    deleted.append(UPLOADS_DIR / entry.name)
+                    logger.info("Periodic cleanup: %s", entry.path)
+            except FileNotFoundError:
+                # Deleted by a privacy cleanup or eviction since the directory read
+                continue
+    return deleted
+
+
 # Background cleanup task for safety
 async def periodic_cleanup():
-    """Safety net: cleanup old files every 5 minutes"""
+    """Safety net: cleanup old files roughly every 5 minutes"""
     while True:
         try:
             if UPLOADS_DIR.exists():
-                current_time = time.time()
-                for file_path in UPLOADS_DIR.iterdir():
-                    # Delete files older than 5 minutes
-                    if file_path.stat().st_mtime < current_time - 300:
-                        file_path.unlink()
-                        print(f"🧹 Periodic cleanup: {file_path}")
+                # Delete files older than 5 minutes, off the event loop
+                deleted = await asyncio.to_thread(sweep_uploads, 300)
+
+                # Stop tracking them, so eviction never revisits a swept file
+                for path in deleted:
+                    RECENT_UPLOADS.pop(path, None)
         except Exception as e:
-            print(f"⚠️ Periodic cleanup error: {e}")
+            logger.warning("Periodic cleanup error: %s", e)
+
+        # Jitter keeps multiple workers from sweeping the directory in lockstep
+        await asyncio.sleep(CLEANUP_INTERVAL * (0.8 + random.random() * 0.4))
 
-        await asyncio.sleep(300)  # 5 minutes
+
+def configure_logging() -> QueueListener:
+    """
+    Send app log records through a queue to a listener thread
+    Request handlers only enqueue; the stderr write happens off the event loop
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
-    UPLOADS_DIR.mkdir(exist_ok=True)
-    print("📁 Uploads directory ready")
+    global LOG_LISTENER, face_analyzer, claude_client
+    LOG_LISTENER = configure_logging()
+
+    # Initialize services, once per serving process
+    claude_client = ClaudeClient()
+    if ANALYSIS_PROCESSES > 0:
+        # Analysis runs in the subprocesses, so this process needs no FaceMesh
+        face_analyzer = FaceAnalyzer(pool_size=0)
+        face_analyzer.start_process_pool(ANALYSIS_PROCESSES)
+        logger.info("Face analysis process pool started (%d workers)", ANALYSIS_PROCESSES)
+    else:
+        face_analyzer = FaceAnalyzer()
+
+    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    logger.info("Uploads directory ready: %s", UPLOADS_DIR)
+
+    # Headroom for analysis, file I/O and cleanup offloaded via asyncio.to_thread
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE)
+    )
 
     # Start background cleanup task
     asyncio.create_task(periodic_cleanup())
-    print("🧹 Periodic cleanup task started")
+    logger.info("Periodic cleanup task started")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop analysis subprocesses and the log listener on shutdown"""
+    if face_analyzer is not None:
+        face_analyzer.shutdown_process_pool()
+
+    # Flush any queued log records
+    if LOG_LISTENER is not None:
+        LOG_LISTENER.stop()
 
 
 if __name__ == "__main__":
     import uvicorn
     # Get port from environment variable (required for Render)
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # Worker processes, one by default; each builds its own services at startup
+    # and sizes its FaceMesh pool from the same WEB_CONCURRENCY value
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    # "auto" picks uvloop and httptools (C-accelerated) when they are installed
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="auto",
+        http="auto"
+    )
\ No newline at end of file
@@ -3,9 +3,9 @@ Pydantic models for GlamAI API
 Defines request/response schemas for type safety
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Optional
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class FaceShape(str, Enum):
@@ -44,6 +44,24 @@ class Undertone(str, Enum):
     NEUTRAL = "neutral"
 
 
+def _int_alias(name: str, str_enum) -> IntEnum:
+    """Build an IntEnum with the same member names, numbered in declaration order"""
+    return IntEnum(name, [member.name for member in str_enum], start=0)
+
+
+# Integer-backed aliases used by the classifiers; the str enums stay the API types
+FaceShapeCode = _int_alias("FaceShapeCode", FaceShape)
+EyeTypeCode = _int_alias("EyeTypeCode", EyeType)
+SkinToneCode = _int_alias("SkinToneCode", SkinTone)
+UndertoneCode = _int_alias("UndertoneCode", Undertone)
+
+# Precomputed lookups between API strings and integer codes, e.g. {"oval": 0, ...}
+FACE_SHAPE_CODES = {member.value: index for index, member in enumerate(FaceShape)}
+EYE_TYPE_CODES = {member.value: index for index, member in enumerate(EyeType)}
+SKIN_TONE_CODES = {member.value: index for index, member in enumerate(SkinTone)}
+UNDERTONE_CODES = {member.value: index for index, member in enumerate(Undertone)}
+
+
 class AnalysisResponse(BaseModel):
     """Response model for face analysis"""
     face_shape: FaceShape = Field(..., description="Detected face shape")
@@ -64,8 +82,7 @@ class AnalysisResponse(BaseModel):
     # Confidence scores
     analysis_confidence: float = Field(..., ge=0.0, le=1.0, description="Overall analysis confidence")
 
-    class Config:
-        use_enum_values = True
+    model_config = ConfigDict(use_enum_values=True)
 
 
 class MakeupLook(BaseModel):
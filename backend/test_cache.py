@@ -0,0 +1,126 @@
+"""
+Unit tests for the recommendation caches
+Run from backend/ with: python -m unittest
+"""
+
+import unittest
+from unittest import mock
+
+from cache import LRUCache, SemanticCache
+
+
+ANALYSIS = {
+    "face_shape": "oval",
+    "eye_type": "almond",
+    "skin_tone": "medium",
+    "undertone": "warm",
+    "eye_distance_ratio": 0.35,
+    "lip_thickness_ratio": 0.03,
+    "nose_width_ratio": 0.25,
+    "face_symmetry": 0.8,
+    "eyebrow_arch_height": 0.6,
+    "has_prominent_cheekbones": 0.0,
+}
+
+RESPONSE = {"looks": ["natural"]}
+
+
+def _variant(**changes):
+    analysis = dict(ANALYSIS)
+    analysis.update(changes)
+    return analysis
+
+
+class SemanticCacheTests(unittest.TestCase):
+    def test_exact_repeat_hits(self):
+        cache = SemanticCache()
+        cache.put(ANALYSIS, RESPONSE)
+        self.assertIs(cache.get(dict(ANALYSIS)), RESPONSE)
+
+    def test_categories_must_match_exactly(self):
+        cache = SemanticCache()
+        cache.put(ANALYSIS, RESPONSE)
+        for field, other in [("face_shape", "round"), ("eye_type", "hooded"),
+                             ("skin_tone", "tan"), ("undertone", "cool")]:
+            with self.subTest(field=field):
+                self.assertIsNone(cache.get(_variant(**{field: other})))
+
+    def test_unknown_category_never_matches_known(self):
+        cache = SemanticCache()
+        cache.put(ANALYSIS, RESPONSE)
+        self.assertIsNone(cache.get(_variant(face_shape="triangle")))
+
+    def test_numeric_fields_within_tolerance_hit(self):
+        cache = SemanticCache()
+        cache.put(ANALYSIS, RESPONSE)
+        nearby = _variant(eye_distance_ratio=0.369, lip_thickness_ratio=0.0345,
+                          nose_width_ratio=0.231, face_symmetry=0.849, eyebrow_arch_height=0.551)
+        self.assertIs(cache.get(nearby), RESPONSE)
+
+    def test_numeric_field_beyond_tolerance_misses(self):
+        cache = SemanticCache()
+        cache.put(ANALYSIS, RESPONSE)
+        for field, value in [("eye_distance_ratio", 0.371), ("lip_thickness_ratio", 0.0355),
+                             ("nose_width_ratio", 0.229), ("face_symmetry", 0.851),
+                             ("eyebrow_arch_height", 0.549), ("has_prominent_cheekbones", 1.0)]:
+            with self.subTest(field=field):
+                self.assertIsNone(cache.get(_variant(**{field: value})))
+
+    def test_tolerance_scale_widens_matches(self):
+        cache = SemanticCache(tolerance_scale=2.0)
+        cache.put(ANALYSIS, RESPONSE)
+        self.assertIs(cache.get(_variant(eye_distance_ratio=0.385)), RESPONSE)
+
+    def test_closest_match_wins(self):
+        cache = SemanticCache()
+        far, near = {"looks": ["far"]}, {"looks": ["near"]}
+        cache.put(_variant(face_symmetry=0.76), far)
+        cache.put(_variant(face_symmetry=0.79), near)
+        self.assertIs(cache.get(ANALYSIS), near)
+
+    def test_eviction_rebuilds_matrix(self):
+        cache = SemanticCache(max_entries=1)
+        cache.put(ANALYSIS, RESPONSE)
+        self.assertIs(cache.get(ANALYSIS), RESPONSE)
+
+        replacement = {"looks": ["bold"]}
+        cache.put(_variant(face_shape="round"), replacement)
+        self.assertIsNone(cache.get(ANALYSIS))
+        self.assertIs(cache.get(_variant(face_shape="round")), replacement)
+        self.assertEqual(len(cache._categories), 1)
+
+    def test_expiry_rebuilds_matrix(self):
+        cache = SemanticCache(ttl_seconds=60)
+        with mock.patch("cache.time.monotonic", return_value=1000.0):
+            cache.put(ANALYSIS, RESPONSE)
+            self.assertIs(cache.get(ANALYSIS), RESPONSE)
+        with mock.patch("cache.time.monotonic", return_value=1030.0):
+            cache.put(_variant(face_shape="round"), {"looks": ["bold"]})
+        with mock.patch("cache.time.monotonic", return_value=1061.0):
+            self.assertIsNone(cache.get(ANALYSIS))
+            self.assertEqual(len(cache._categories), 1)
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(ttl_seconds=60)
+        with mock.patch("cache.time.monotonic", return_value=1000.0):
+            cache.put("a", 1)
+        with mock.patch("cache.time.monotonic", return_value=1060.0):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("cache.time.monotonic", return_value=1061.0):
+            self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
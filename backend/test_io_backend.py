@@ -0,0 +1,63 @@
+"""
+Unit tests for the batched upload writer
+Run from backend/ with: python -m unittest
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import io_backend
+
+
+async def _aiter(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@unittest.skipUnless(hasattr(os, "writev"), "os.writev not available")
+class WritevAllTests(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.path)
+
+    def _read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_short_writes_are_resubmitted(self):
+        real_writev = os.writev
+        calls = []
+
+        def short_writev(fd, buffers):
+            # Write at most 3 bytes per call, like a pipe or full disk would
+            calls.append(len(buffers))
+            head = bytes(buffers[0][:3])
+            return real_writev(fd, [head])
+
+        chunks = [b"hello", b"", b" wor", b"ld"]
+        fd = os.open(self.path, os.O_WRONLY)
+        try:
+            with mock.patch("io_backend.os.writev", side_effect=short_writev):
+                total = io_backend._writev_all(fd, chunks)
+        finally:
+            os.close(fd)
+
+        self.assertEqual(total, 11)
+        self.assertEqual(self._read(), b"hello world")
+        self.assertGreater(len(calls), 1)
+
+    def test_write_all_batches_chunks(self):
+        chunks = [bytes([i]) * 1000 for i in range(10)]
+        with mock.patch("io_backend.WRITE_BATCH_SIZE", 3000):
+            total = asyncio.run(io_backend.write_all(self.path, _aiter(chunks)))
+
+        self.assertEqual(total, 10000)
+        self.assertEqual(self._read(), b"".join(chunks))
+
+
+if __name__ == "__main__":
+    unittest.main()